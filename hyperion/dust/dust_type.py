@@ -13,6 +13,7 @@ from __future__ import print_function, division
 
 import os
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 import h5py
 import numpy as np
@@ -22,7 +23,7 @@ import six
 from ..version import __version__
 
 from ..util.constants import c
-from ..util.functions import FreezableClass
+from ..util.functions import FreezableClass, atomic_open
 from ..util.interpolate import interp1d_fast_loglog
 from ..util.integrate import integrate_loglog
 from ..util.nans import check_for_nans
@@ -31,12 +32,143 @@ from .optical_properties import OpticalProperties
 from .emissivities import Emissivities
 from .mean_opacities import MeanOpacities
 
+# Valid dust sublimation modes, and the subset of these which require a
+# sublimation specific energy
+_SUBLIMATION_MODES = frozenset(['no', 'fast', 'slow', 'cap'])
+_SUBLIMATION_MODES_WITH_ENERGY = frozenset(['fast', 'slow', 'cap'])
+
+# Numba kernel used by henyey_greenstein, which is only compiled when first
+# needed to avoid importing Numba when importing this module. This is set to
+# False if Numba is not installed.
+_hg_kernel = None
+
+# Minimum number of scattering matrix elements for which the Numba kernel is
+# used - below this, loading Numba takes much longer than the NumPy version.
+_HG_KERNEL_MIN_SIZE = 10 ** 6
+
+
+def _get_hg_kernel():
+
+    global _hg_kernel
+
+    if _hg_kernel is None:
+
+        try:
+            from numba import njit, prange
+        except ImportError:
+            _hg_kernel = False
+            return _hg_kernel
+
+        @njit(parallel=True, fastmath=True, cache=True)
+        def _kernel(mu, g, p_lin_max, P1, P2, P3, P4):
+            for j in prange(g.shape[0]):
+                gj = g[j]
+                for i in range(mu.shape[0]):
+                    m = mu[i]
+                    mu2 = m * m
+                    if gj == 0.:
+                        p1 = 1.
+                    else:
+                        x = 1. + gj * gj - 2. * gj * m
+                        p1 = (1. - gj * gj) / (x * np.sqrt(x))
+                    P1[j, i] = p1
+                    P2[j, i] = - p_lin_max[j] * p1 * (1. - mu2) / (1. + mu2)
+                    P3[j, i] = p1 * 2. * m / (1. + mu2)
+                    P4[j, i] = 0.
+
+        _hg_kernel = _kernel
+
+    return _hg_kernel
+
+
+def henyey_greenstein(mu, g, p_lin_max, out=None):
+    """
+    Compute the Henyey-Greenstein scattering matrix elements.
+
+    The elements are computed on the outer product of ``g`` and ``mu``, so
+    that if ``g`` and ``p_lin_max`` have shape ``(n_wav,)`` and ``mu`` has
+    shape ``(n_mu,)``, the returned arrays have shape ``(n_wav, n_mu)``.
+
+    Parameters
+    ----------
+    mu : float or array_like
+        The cosine of the scattering angle(s)
+    g : float or array_like
+        The asymmetry parameter(s)
+    p_lin_max : float or array_like
+        The maximum linear polarization, which should be a scalar or have the
+        same shape as ``g``
+    out : tuple of 4 arrays, optional
+        Arrays in which to place the P1, P2, P3, and P4 elements. These
+        should have the same shape as the output.
+
+    Returns
+    -------
+    P1, P2, P3, P4 : `~numpy.ndarray`
+        The scattering matrix elements
+    """
+
+    mu = np.asarray(mu, dtype=float)
+    g = np.asarray(g, dtype=float)
+    p_lin_max = np.asarray(p_lin_max, dtype=float)
+
+    if p_lin_max.shape != g.shape:
+        try:
+            p_lin_max = np.broadcast_to(p_lin_max, g.shape)
+        except ValueError:
+            raise ValueError("p_lin_max should be a scalar or have the same shape as g")
+
+    shape = g.shape + mu.shape
+
+    if out is None:
+        out = tuple(np.empty(shape) for i in range(4))
+    else:
+        for P in out:
+            if P.shape != shape:
+                raise ValueError("out arrays have shape %s but expected %s" % (P.shape, shape))
+
+    P1, P2, P3, P4 = out
+
+    # If Numba is available, use the compiled kernel for the common case of
+    # large 1-D mu and g arrays, which avoids creating temporary arrays. Note
+    # that the kernel relies on the shapes having been checked above.
+    if (mu.ndim == 1 and g.ndim == 1 and
+            g.size * mu.size >= _HG_KERNEL_MIN_SIZE and
+            all(P.dtype == np.float64 for P in out) and
+            _get_hg_kernel()):
+        _hg_kernel(mu, g, p_lin_max, P1, P2, P3, P4)
+        return P1, P2, P3, P4
+
+    # Add dimensions to g and p_lin_max so that they broadcast against mu
+    g = g.reshape(g.shape + (1,) * mu.ndim)
+    p_lin_max = p_lin_max.reshape(p_lin_max.shape + (1,) * mu.ndim)
+
+    mu2 = mu * mu
+
+    if not np.any(g):
+
+        # Isotropic scattering, so P1 is exactly one
+        P1[...] = 1.
+
+    else:
+
+        g2 = g * g
+
+        # x ** -1.5 is computed as 1 / (x * sqrt(x)), which is cheaper than
+        # np.power. P4 is used as scratch space since it is zeroed below.
+        np.multiply(g, -2. * mu, out=P1)
+        P1 += 1. + g2
+        np.sqrt(P1, out=P4)
+        P1 *= P4
+        np.divide(1. - g2, P1, out=P1)
+
+    np.multiply(P1, (1. - mu2) / (1. + mu2), out=P2)
+    P2 *= -p_lin_max
+
+    np.multiply(P1, 2. * mu / (1. + mu2), out=P3)
+
+    P4[...] = 0.
 
-def henyey_greenstein(mu, g, p_lin_max):
-    P1 = (1. - g * g) / (1. + g * g - 2. * g * mu) ** 1.5
-    P2 = - p_lin_max * P1 * (1. - mu * mu) / (1. + mu * mu)
-    P3 = P1 * 2. * mu / (1. + mu * mu)
-    P4 = 0.
     return P1, P2, P3, P4
 
 
@@ -55,12 +187,19 @@ class SphericalDust(FreezableClass):
     and the properties should then be set manually. See
     `here <http://docs.hyperion-rt.org/en/stable/setup/setup_dust.html#fully-customized-4-element-dust>`_
     for a description of the available properties and how to set them.
+
+    The mean opacities are computed automatically when needed. Since this
+    can be slow, the ``mean_opacities_cache_dir`` attribute can be set to a
+    directory (e.g. ``~/.cache/hyperion``) in which the computed mean
+    opacities are saved and from which they are re-used for identical
+    optical properties.
     """
 
     def __init__(self, *args):
 
         self._file = None
         self.md5 = None
+        self.mean_opacities_cache_dir = None
 
         self.optical_properties = OpticalProperties()
         self.mean_opacities = MeanOpacities()
@@ -116,7 +255,8 @@ class SphericalDust(FreezableClass):
             The maximum temperature to calculate the emissivities for
         '''
         self.mean_opacities.compute(self.optical_properties, n_temp=n_temp,
-                                    temp_min=temp_min, temp_max=temp_max)
+                                    temp_min=temp_min, temp_max=temp_max,
+                                    cache_dir=self.mean_opacities_cache_dir)
         self.emissivities.set_lte(self.optical_properties, self.mean_opacities)
 
     def plot(self, filename):
@@ -192,7 +332,7 @@ class SphericalDust(FreezableClass):
             The dust sublimation temperature, in K
         '''
 
-        if mode not in ['no', 'fast', 'slow', 'cap']:
+        if mode not in _SUBLIMATION_MODES:
             raise Exception("mode should be one of no/fast/slow/cap")
 
         if mode != 'no' and temperature is None:
@@ -222,7 +362,7 @@ class SphericalDust(FreezableClass):
             The dust sublimation specific energy, in cgs
         '''
 
-        if mode not in ['no', 'fast', 'slow', 'cap']:
+        if mode not in _SUBLIMATION_MODES:
             raise Exception("mode should be one of no/fast/slow/cap")
 
         if mode != 'no' and specific_energy is None:
@@ -233,23 +373,31 @@ class SphericalDust(FreezableClass):
 
     def _write_dust_sublimation(self, group):
         group.attrs['sublimation_mode'] = np.string_(self.sublimation_mode)
-        if self.sublimation_mode in ['slow', 'fast', 'cap']:
+        if self.sublimation_mode in _SUBLIMATION_MODES_WITH_ENERGY:
             group.attrs['sublimation_specific_energy'] = self.sublimation_energy
 
     def _read_dust_sublimation(self, group):
         if 'sublimation_mode' in group.attrs:
             self.sublimation_mode = group.attrs['sublimation_mode'].decode('ascii')
-            if self.sublimation_mode in ['slow', 'fast', 'cap']:
+            if self.sublimation_mode in _SUBLIMATION_MODES_WITH_ENERGY:
                 self.sublimation_energy = group.attrs['sublimation_specific_energy']
 
     def _compute_mean_opacities(self):
         if not self.mean_opacities.all_set():
-            self.mean_opacities.compute(self.optical_properties)
+            self.mean_opacities.compute(self.optical_properties,
+                                        cache_dir=self.mean_opacities_cache_dir)
 
-    def write(self, filename, compression=True):
+    def write(self, filename, compression=False):
         '''
         Write out to a standard dust file, including calculations of the mean
         opacities and optionally thermal emissivities.
+
+        Parameters
+        ----------
+        filename : str or h5py.File
+            The name of the dust file to write, or an open HDF5 file.
+        compression : bool
+            Whether to compress the datasets inside the HDF5 file.
         '''
 
         # Check that the optical properties have been set
@@ -276,14 +424,18 @@ class SphericalDust(FreezableClass):
         if self.md5:
             dt.attrs['asciimd5'] = np.string_(self.md5)
 
+        # Note that h5py interprets False as gzip compression level 0, so we
+        # need to explicitly pass None to disable compression
+        compression = 'gzip' if compression else None
+
         # Add optical properties and scattering angle tables
-        self.optical_properties.to_hdf5_group(dt)
+        self.optical_properties.to_hdf5_group(dt, compression=compression)
 
         # Add mean opacities table
-        self.mean_opacities.to_hdf5_group(dt)
+        self.mean_opacities.to_hdf5_group(dt, compression=compression)
 
         # Add emissivities and emissivity variable tables
-        self.emissivities.to_hdf5_group(dt)
+        self.emissivities.to_hdf5_group(dt, compression=compression)
 
         # Dust sublimation parameters
         self._write_dust_sublimation(dt)
@@ -534,14 +686,13 @@ class IsotropicDust(SphericalDust):
         self.optical_properties.albedo = albedo
         self.optical_properties.chi = chi
 
-        # Compute scattering matrix elements
-        self.optical_properties.initialize_scattering_matrix()
-
-        # Set scattering matrix to isotropic values
-        self.optical_properties.P1[:, :] = 1.
-        self.optical_properties.P2[:, :] = 0.
-        self.optical_properties.P3[:, :] = 1.
-        self.optical_properties.P4[:, :] = 0.
+        # Set scattering matrix to isotropic values. All the elements are set
+        # below, so they do not need to be zeroed first.
+        self.optical_properties.initialize_scattering_matrix(init=False)
+        self.optical_properties.P1[...] = 1.
+        self.optical_properties.P2[...] = 0.
+        self.optical_properties.P3[...] = 1.
+        self.optical_properties.P4[...] = 0.
 
         # Sort optical properties
         self.optical_properties._sort()
@@ -575,14 +726,40 @@ class HenyeyGreensteinDust(SphericalDust):
         self.optical_properties.albedo = albedo
         self.optical_properties.chi = chi
 
-        # Compute scattering matrix elements
-        self.optical_properties.initialize_scattering_matrix()
-
-        for i in range(n_mu):
-            self.optical_properties.P1[:, i], \
-                self.optical_properties.P2[:, i], \
-                self.optical_properties.P3[:, i], \
-                self.optical_properties.P4[:, i] = henyey_greenstein(self.optical_properties.mu[i], g, p_lin_max)
+        # The scattering parameters should either be scalars or be given for
+        # each frequency
+        nu = self.optical_properties.nu
+        try:
+            g = np.broadcast_to(np.asarray(g, dtype=float), nu.shape)
+        except ValueError:
+            raise ValueError("g should be a scalar or have the same length as nu")
+        try:
+            p_lin_max = np.broadcast_to(np.asarray(p_lin_max, dtype=float), nu.shape)
+        except ValueError:
+            raise ValueError("p_lin_max should be a scalar or have the same length as nu")
+
+        # Compute scattering matrix elements. All the elements are set by
+        # henyey_greenstein, so they do not need to be zeroed first.
+        self.optical_properties.initialize_scattering_matrix(init=False)
+
+        henyey_greenstein(self.optical_properties.mu, g, p_lin_max,
+                          out=(self.optical_properties.P1,
+                               self.optical_properties.P2,
+                               self.optical_properties.P3,
+                               self.optical_properties.P4))
+
+
+def _file_md5(fileobj, chunk_size=2 ** 20):
+    """
+    Compute the MD5 hash of an open binary file without reading it into
+    memory all at once.
+    """
+    if hasattr(hashlib, 'file_digest'):  # Python >= 3.11
+        return hashlib.file_digest(fileobj, 'md5').hexdigest()
+    h = hashlib.md5()
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        h.update(chunk)
+    return h.hexdigest()
 
 
 class HOCHUNKDust(HenyeyGreensteinDust):
@@ -601,26 +778,58 @@ class HOCHUNKDust(HenyeyGreensteinDust):
 
     def __init__(self, filename):
 
-        # Read in dust file
-        dustfile = np.loadtxt(filename, dtype=[('wav', float), ('c_ext', float),
-                                               ('c_sca', float), ('chi', float), ('g', float),
-                                               ('p_lin_max', float)], usecols=[0, 1, 2, 3, 4, 5])
+        with open(filename, 'rb') as f:
+
+            # Compute the MD5 hash of the file contents
+            md5 = _file_md5(f)
+
+            # Read in dust file
+            f.seek(0)
+            dustfile = np.loadtxt(f, usecols=[0, 1, 2, 3, 4, 5], ndmin=2)
 
         # Ensure file is ordered in increasing frequency
-        if dustfile['wav'][-1] > dustfile['wav'][0]:
+        if dustfile[-1, 0] > dustfile[0, 0]:
             dustfile = dustfile[::-1]
 
+        wav, c_ext, c_sca, chi, g, p_lin_max = dustfile.T
+
         # Compute frequency and albedo
-        nu = c / dustfile['wav'] * 1.e4
-        albedo = dustfile['c_sca'] / dustfile['c_ext']
+        nu = c / wav * 1.e4
+        albedo = c_sca / c_ext
 
-        self.md5 = hashlib.md5(open(filename, 'rb').read()).hexdigest()
+        HenyeyGreensteinDust.__init__(self, nu, albedo, chi, g, p_lin_max)
 
-        HenyeyGreensteinDust.__init__(self, nu, albedo, dustfile['chi'], dustfile['g'], dustfile['p_lin_max'])
+        # This needs to be set after initialization, since the parent
+        # class resets the MD5 hash
+        self.md5 = md5
 
 TTsreDust = HOCHUNKDust
 
 
+def _read_coatsph_phase_files(optical_properties, filenames, skiprows):
+    """
+    Read in the scattering angles and matrix elements from coatsph phase
+    files (one per wavelength) into ``optical_properties``. The files are
+    read in parallel using threads.
+    """
+
+    def read(filename):
+        return np.loadtxt(filename, skiprows=skiprows,
+                          dtype=[('theta', float), ('s11', float),
+                                 ('polariz', float), ('s12', float),
+                                 ('s33', float), ('s34', float)])
+
+    with ThreadPoolExecutor() as executor:
+        phasefiles = list(executor.map(read, filenames))
+
+    optical_properties.mu = np.cos(np.radians(phasefiles[0]['theta']))
+
+    optical_properties.P1 = np.vstack([phasefile['s11'] for phasefile in phasefiles])
+    optical_properties.P2 = np.vstack([phasefile['s12'] for phasefile in phasefiles])
+    optical_properties.P3 = np.vstack([phasefile['s33'] for phasefile in phasefiles])
+    optical_properties.P4 = np.vstack([phasefile['s34'] for phasefile in phasefiles])
+
+
 class CoatsphSingle(SphericalDust):
 
     def __init__(self, directory, size, density):
@@ -658,23 +867,10 @@ class CoatsphSingle(SphericalDust):
 
         # Read in scattering matrix elements
 
-        for i in range(n_wav):
-
-            filename = '%s/coatsph_scat_%04i_0001.dat' % (directory, i + 1)
-
-            phasefile = np.loadtxt(filename, skiprows=9,
-                                   dtype=[('theta', float), ('s11', float), ('polariz',
-                                                                             float), ('s12', float), ('s33', float), ('s34',
-                                                                                                                      float)])
+        filenames = ['%s/coatsph_scat_%04i_0001.dat' % (directory, i + 1)
+                     for i in range(n_wav)]
 
-            if i == 0:
-                self.optical_properties.mu = np.cos(np.radians(phasefile['theta']))
-                self.optical_properties.initialize_scattering_matrix()
-
-            self.optical_properties.P1[i, :] = phasefile['s11']
-            self.optical_properties.P2[i, :] = phasefile['s12']
-            self.optical_properties.P3[i, :] = phasefile['s33']
-            self.optical_properties.P4[i, :] = phasefile['s34']
+        _read_coatsph_phase_files(self.optical_properties, filenames, skiprows=9)
 
 
 class CoatsphMultiple(SphericalDust):
@@ -709,23 +905,118 @@ class CoatsphMultiple(SphericalDust):
 
         # Read in scattering matrix elements
 
-        for i in range(n_wav):
+        filenames = ['%s/coatsph_scat.%04i.dat' % (directory, i + 1)
+                     for i in range(n_wav)]
+
+        _read_coatsph_phase_files(self.optical_properties, filenames, skiprows=7)
+
+
+def _read_miex_matrix(filename, n_wav, n_mu=None):
+    """
+    Read in a MieX scattering matrix element file, and return the wavelengths,
+    the scattering angles (in degrees), and the matrix element values as a
+    (n_wav, n_mu) array, in the order in which the scattering angles appear
+    in the file. If ``n_mu`` is not specified, it is determined from the
+    number of lines in the file.
+    """
+
+    with open(filename) as f:
+        f.readline()
+        data = np.fromstring(f.read(), sep=' ')
+
+    # Each wavelength block consists of a line with the wavelength followed
+    # by n_mu lines with the scattering angle and matrix element value, so
+    # the values can be parsed in one go and reshaped.
+    if n_mu is None:
+        n_mu = (len(data) // n_wav - 1) // 2
+
+    block_size = 1 + 2 * n_mu
+
+    if len(data) < n_wav * block_size:
+        raise Exception("Not enough values in %s" % filename)
+
+    data = data[:n_wav * block_size].reshape(n_wav, block_size)
+
+    return data[:, 0], data[0, 1::2], data[:, 2::2]
+
+
+def _interpolate_nans_loglog(x, values, invalid=None):
+    """
+    Replace NaN values in the 2-D array ``values`` in-place by interpolating
+    in log-log space along the first dimension, which corresponds to the
+    monotonically increasing ``x``. As for `interp1d_fast_loglog`, the result
+    is zero if either of the neighboring values is not strictly positive.
+    NaN values that cannot be interpolated are left unchanged. If the mask of
+    NaN values has already been computed, it can be passed as ``invalid``.
+    """
+
+    if invalid is None:
+        invalid = np.isnan(values)
+
+    # Columns with NaN values in the same rows share the same interpolation
+    # weights, so we interpolate each group of such columns at once. To find
+    # the groups, the mask for each column is packed into a single opaque
+    # value, since np.unique only supports the axis= argument in Numpy 1.13
+    # and later.
+    packed = np.ascontiguousarray(np.packbits(invalid.T, axis=1))
+    keys = packed.view(np.dtype((np.void, packed.shape[1]))).ravel()
+    _, first, groups = np.unique(keys, return_index=True, return_inverse=True)
+
+    for ipattern, icolumn in enumerate(first):
+
+        bad = invalid[:, icolumn]
+
+        if not np.any(bad):
+            continue
 
-            filename = '%s/coatsph_scat.%04i.dat' % (directory, i + 1)
+        columns = np.nonzero(groups == ipattern)[0]
 
-            phasefile = np.loadtxt(filename, skiprows=7,
-                                   dtype=[('theta', float), ('s11', float), ('polariz',
-                                                                             float), ('s12', float), ('s33', float), ('s34',
-                                                                                                                      float)])
+        good = ~bad
 
-            if i == 0:
-                self.optical_properties.mu = np.cos(np.radians(phasefile['theta']))
-                self.optical_properties.initialize_scattering_matrix()
+        x_good = x[good]
 
-            self.optical_properties.P1[i, :] = phasefile['s11']
-            self.optical_properties.P2[i, :] = phasefile['s12']
-            self.optical_properties.P3[i, :] = phasefile['s33']
-            self.optical_properties.P4[i, :] = phasefile['s34']
+        if len(x_good) < 2:
+            continue
+
+        # Only interpolate values inside the range of valid values
+        bad = bad & (x >= x_good[0]) & (x <= x_good[-1])
+
+        ipos = np.clip(np.searchsorted(x_good, x[bad]), 1, len(x_good) - 1)
+
+        y_good = values[np.ix_(good, columns)]
+        y1 = y_good[ipos - 1]
+        y2 = y_good[ipos]
+
+        weight = ((np.log10(x[bad]) - np.log10(x_good[ipos - 1]))
+                  / (np.log10(x_good[ipos]) - np.log10(x_good[ipos - 1])))[:, np.newaxis]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values[np.ix_(bad, columns)] = np.where((y1 > 0.) & (y2 > 0.),
+                                                    10. ** (np.log10(y1) + weight * (np.log10(y2) - np.log10(y1))),
+                                                    0.)
+
+
+def _fix_miex_nans(nu, values, quantity):
+    """
+    Interpolate over NaN values in-place in a MieX quantity, given as a 1-D
+    (n_wav) or 2-D (n_wav, n_mu) array.
+    """
+
+    invalid = np.isnan(values)
+
+    if not np.any(invalid):
+        return
+
+    logger.warning("NaN values found inside MieX %s file - interpolating" % quantity)
+
+    if values.ndim == 1:
+        _interpolate_nans_loglog(nu, values[:, np.newaxis], invalid[:, np.newaxis])
+    else:
+        _interpolate_nans_loglog(nu, values, invalid)
+
+    # Only the values that were originally NaN can still be NaN
+    if np.any(np.isnan(values[invalid])):
+        raise Exception("Did not manage to fix NaN values in MieX %s" % quantity)
 
 
 class MieXDust(SphericalDust):
@@ -734,83 +1025,74 @@ class MieXDust(SphericalDust):
 
         SphericalDust.__init__(self)
 
-        wav = np.loadtxt('%s.alb' % model, usecols=[0])
-        self.optical_properties.albedo = np.loadtxt('%s.alb' % model, usecols=[1])
+        wav, self.optical_properties.albedo = np.loadtxt('%s.alb' % model, usecols=[0, 1], unpack=True)
         kappa = np.loadtxt('%s.k_abs' % model, usecols=[1])
         self.optical_properties.chi = kappa / (1 - self.optical_properties.albedo)
 
+        self.optical_properties.nu = c / wav * 1.e4
+
         # Check for NaN values
         for quantity in ['chi', 'albedo']:
+            _fix_miex_nans(self.optical_properties.nu,
+                           getattr(self.optical_properties, quantity), quantity)
 
-            values = self.optical_properties.__dict__[quantity]
-
-            if np.any(np.isnan(values)):
-                logger.warning("NaN values found inside MieX %s file - interpolating" % quantity)
-                invalid = np.isnan(values)
-                values[invalid] = interp1d_fast_loglog(wav[~invalid], values[~invalid], wav[invalid])
-                if np.any(np.isnan(values)):
-                    raise Exception("Did not manage to fix NaN values in MieX %s" % quantity)
+        n_wav = len(wav)
 
-        self.optical_properties.nu = c / wav * 1.e4
+        # Read in the first matrix element file, which also gives the
+        # scattering angles
+        wav_file, theta, values = _read_miex_matrix('%s.f11' % model, n_wav)
+        n_mu = len(theta)
+        self.optical_properties.mu = np.cos(np.radians(theta))[::-1]
 
-        n_wav = len(wav)
-        n_mu = (len(open('%s.f11' % model).readlines()) // n_wav) - 1
+        # Read in matrix elements (these are all overwritten below)
 
-        mu = np.zeros(n_mu)
+        self.optical_properties.initialize_scattering_matrix(init=False)
 
-        # Read mu
-        f11 = open('%s.f11' % model)
-        f11.readline()
-        f11.readline()
-        for i in range(n_mu):
-            mu[i] = np.cos(np.radians(float(f11.readline().split()[0])))
-        f11.close()
-        self.optical_properties.mu = mu[::-1]
+        for quantity, extension in [('P1', 'f11'), ('P2', 'f12'),
+                                    ('P3', 'f33'), ('P4', 'f34')]:
 
-        # Read in matrix elements
+            if extension != 'f11':
+                wav_file, _, values = _read_miex_matrix('%s.%s' % (model, extension), n_wav, n_mu)
 
-        self.optical_properties.initialize_scattering_matrix()
+            if not np.array_equal(wav_file, wav):
+                raise Exception("Incorrect wavelength in %s" % extension)
 
-        f11 = open('%s.f11' % model)
-        f12 = open('%s.f12' % model)
-        f33 = open('%s.f33' % model)
-        f34 = open('%s.f34' % model)
+            getattr(self.optical_properties, quantity)[:, :] = values[:, ::-1]
 
-        f11.readline()
-        f12.readline()
-        f33.readline()
-        f34.readline()
+        # Check for NaN values
+        for quantity in ['P1', 'P2', 'P3', 'P4']:
+            _fix_miex_nans(self.optical_properties.nu,
+                           getattr(self.optical_properties, quantity), quantity)
 
-        for j in range(n_wav):
 
-            if float(f11.readline()) != wav[j]:
-                raise Exception("Incorrect wavelength in f11")
-            if float(f12.readline()) != wav[j]:
-                raise Exception("Incorrect wavelength in f12")
-            if float(f33.readline()) != wav[j]:
-                raise Exception("Incorrect wavelength in f33")
-            if float(f34.readline()) != wav[j]:
-                raise Exception("Incorrect wavelength in f34")
+def _loadtxt_cached(filename, cache):
+    """
+    Read in a text file with np.loadtxt. If ``cache`` is `True`, the array is
+    also saved to a .npy file next to the original file, which is then used
+    instead of the text file as long as it is more recent.
+    """
 
-            for i in range(n_mu):
+    if not cache:
+        return np.loadtxt(filename)
 
-                self.optical_properties.P1[j, n_mu - i - 1] = float(f11.readline().split()[1])
-                self.optical_properties.P2[j, n_mu - i - 1] = float(f12.readline().split()[1])
-                self.optical_properties.P3[j, n_mu - i - 1] = float(f33.readline().split()[1])
-                self.optical_properties.P4[j, n_mu - i - 1] = float(f34.readline().split()[1])
+    cache_filename = filename + '.npy'
 
-        for i in range(n_mu):
+    if (os.path.exists(cache_filename) and
+            os.path.getmtime(cache_filename) >= os.path.getmtime(filename)):
+        try:
+            return np.load(cache_filename)
+        except (IOError, OSError, ValueError, EOFError):
+            logger.warning("Could not read cache file: %s - ignoring" % cache_filename)
 
-            for quantity in ['P1', 'P2', 'P3', 'P4']:
+    values = np.loadtxt(filename)
 
-                values = self.optical_properties.__dict__[quantity]
+    try:
+        with atomic_open(cache_filename) as f:
+            np.save(f, values)
+    except (IOError, OSError):
+        logger.warning("Could not write cache file: %s" % cache_filename)
 
-                if np.any(np.isnan(values[:, i])):
-                    logger.warning("NaN values found inside MieX %s file - interpolating" % quantity)
-                    invalid = np.isnan(values[:, i])
-                    values[:, i][invalid] = interp1d_fast_loglog(wav[~invalid], values[:, i][~invalid], wav[invalid])
-                    if np.any(np.isnan(values[:, i])):
-                        raise Exception("Did not manage to fix NaN values in MieX %s" % quantity)
+    return values
 
 
 class BHDust(SphericalDust):
@@ -830,22 +1112,26 @@ class BHDust(SphericalDust):
         >>> from hyperion.dust import BHDust
         >>> d = BHDust('directory/mydust')
 
+    If ``cache=True`` is passed, the contents of each file are also saved in
+    binary form to a ``.npy`` file alongside it (e.g. ``mydust.f11.npy``), and
+    subsequent calls read these instead of parsing the text files again. The
+    cached files are not used if the original files are more recent.
     """
 
-    def __init__(self, model):
+    def __init__(self, model, cache=False):
 
         SphericalDust.__init__(self)
 
-        mu = np.loadtxt('%s.mu' % model)
+        mu = _loadtxt_cached('%s.mu' % model, cache)
 
-        nu = c / np.loadtxt('%s.wav' % model) * 1.e4
-        albedo = np.loadtxt('%s.alb' % model)
-        chi = np.loadtxt('%s.chi' % model)
+        nu = c / _loadtxt_cached('%s.wav' % model, cache) * 1.e4
+        albedo = _loadtxt_cached('%s.alb' % model, cache)
+        chi = _loadtxt_cached('%s.chi' % model, cache)
 
-        P1 = np.loadtxt('%s.f11' % model)
-        P2 = np.loadtxt('%s.f12' % model)
-        P3 = np.loadtxt('%s.f33' % model)
-        P4 = np.loadtxt('%s.f34' % model)
+        P1 = _loadtxt_cached('%s.f11' % model, cache)
+        P2 = _loadtxt_cached('%s.f12' % model, cache)
+        P3 = _loadtxt_cached('%s.f33' % model, cache)
+        P4 = _loadtxt_cached('%s.f34' % model, cache)
 
         if nu[-1] < nu[0]:
             nu = nu[::-1]
@@ -3,7 +3,6 @@ from __future__ import print_function, division
 import hashlib
 
 import numpy as np
-from astropy.table import Table, Column
 
 from ..util.integrate import integrate_loglog
 from ..util.interpolate import interp1d_fast_loglog
@@ -63,7 +62,7 @@ class Emissivities(FreezableClass):
         for it, T in enumerate(temperature):
             self.jnu[:, it] = kappa_nu * B_nu(self.nu, T)
 
-    def to_hdf5_group(self, group):
+    def to_hdf5_group(self, group, compression=None):
 
         if not self.all_set():
             raise Exception("Not all attributes of the emissivities are set")
@@ -75,19 +74,20 @@ class Emissivities(FreezableClass):
             raise Exception("Unknown emissivity variable: %s" % self.var_name)
 
         # Create emissivity variable table
-        temissvar = Table()
-        temissvar.add_column(Column(data=self.var, name=self.var_name))
+        temissvar = np.empty(len(self.var), dtype=[(self.var_name, self.var.dtype)])
+        temissvar[self.var_name] = self.var
 
         # Create emissivities table
-        temiss = Table()
-        temiss.add_column(Column(data=self.nu, name='nu'))
-        temiss.add_column(Column(data=self.jnu, name='jnu'))
+        temiss = np.empty(len(self.nu), dtype=[('nu', self.nu.dtype),
+                                               ('jnu', self.jnu.dtype, (self.jnu.shape[1],))])
+        temiss['nu'] = self.nu
+        temiss['jnu'] = self.jnu
 
         group.attrs['lte'] = bool2str(self.is_lte)
 
         # Add to group
-        temissvar.write(group, path='emissivity_variable')
-        temiss.write(group, path='emissivities')
+        group.create_dataset('emissivity_variable', data=temissvar, compression=compression)
+        group.create_dataset('emissivities', data=temiss, compression=compression)
 
     def from_hdf5_group(self, group):
 
@@ -101,11 +101,11 @@ class Emissivities(FreezableClass):
                             group.attrs['emissvar'])
 
         # Read in emissivity variable
-        temissvar = Table.read(group, path='emissivity_variable')
+        temissvar = group['emissivity_variable'][()]
         self.var = temissvar[self.var_name]
 
         # Read emissivities
-        temiss = Table.read(group, path='emissivities')
+        temiss = group['emissivities'][()]
         self.nu = temiss['nu']
         self.jnu = temiss['jnu']
         self.is_lte = group.attrs['lte'].decode('utf-8').lower() == 'yes'
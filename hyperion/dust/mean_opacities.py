@@ -1,15 +1,27 @@
 from __future__ import print_function, division
 
+import os
+import struct
 import hashlib
 
 import numpy as np
-from astropy.table import Table, Column
 from astropy import log as logger
 
 from ..util.integrate import integrate_loglog
 from ..util.interpolate import interp1d_fast_loglog
-from ..util.functions import FreezableClass, nu_common, B_nu, dB_nu_dT, planck_nu_range
+from ..util.functions import (FreezableClass, nu_common, B_nu, dB_nu_dT,
+                              planck_nu_range, atomic_open)
 from ..util.constants import sigma
+from ..version import __version__
+
+
+# Version of the mean opacities cache, which should be incremented if the
+# computation of the mean opacities changes
+_CACHE_VERSION = 1
+
+_ATTRIBUTES = ['temperature', 'specific_energy', 'chi_planck', 'kappa_planck',
+               'chi_inv_planck', 'kappa_inv_planck', 'chi_rosseland',
+               'kappa_rosseland']
 
 
 class MeanOpacities(FreezableClass):
@@ -26,15 +38,65 @@ class MeanOpacities(FreezableClass):
         self.kappa_rosseland = None
         self._freeze()
 
-    def compute(self, optical_properties, n_temp=1200, temp_min=0.1, temp_max=100000.):
+    def compute(self, optical_properties, n_temp=1200, temp_min=0.1, temp_max=100000.,
+                cache_dir=None):
         """
         Compute various mean opacities:
 
             * Planck mean opacity
             * Reciprocal Planck mean opacity
             * Rosseland mean opacity
+
+        If ``cache_dir`` is set, the mean opacities are read from that
+        directory if they were previously computed for the same optical
+        properties and temperatures, and are otherwise saved there once
+        computed.
         """
 
+        if cache_dir is not None:
+
+            cache_dir = os.path.expanduser(cache_dir)
+            cache_file = os.path.join(cache_dir, 'mo_{0:s}.npz'.format(
+                self.cache_key(optical_properties, n_temp, temp_min, temp_max)))
+
+            if os.path.exists(cache_file):
+                try:
+                    self.from_npz(cache_file)
+                except Exception:
+                    logger.warning("Could not read mean opacities from {0:s} - recomputing".format(cache_file))
+                else:
+                    return
+
+        self._compute(optical_properties, n_temp, temp_min, temp_max)
+
+        if cache_dir is not None:
+            try:
+                try:
+                    os.makedirs(cache_dir)
+                except FileExistsError:
+                    pass
+                self.to_npz(cache_file)
+            except (IOError, OSError):
+                logger.warning("Could not write mean opacities to {0:s}".format(cache_file))
+
+    @staticmethod
+    def cache_key(optical_properties, n_temp, temp_min, temp_max):
+        """
+        Return a key identifying the mean opacities computed for the given
+        optical properties and temperatures.
+        """
+        h = hashlib.md5()
+        # Include the version so that values computed with a different
+        # version of the code are not re-used
+        h.update('{0:d}:{1:s}'.format(_CACHE_VERSION, __version__).encode('utf-8'))
+        for attribute in ['nu', 'chi', 'albedo']:
+            values = getattr(optical_properties, attribute)
+            h.update(np.ascontiguousarray(values, dtype=float).tobytes())
+        h.update(struct.pack('>idd', n_temp, temp_min, temp_max))
+        return h.hexdigest()
+
+    def _compute(self, optical_properties, n_temp, temp_min, temp_max):
+
         # Set temperatures to compute the mean opacities for
         temperatures = np.logspace(np.log10(temp_min),
                                    np.log10(temp_max), n_temp)
@@ -108,36 +170,41 @@ class MeanOpacities(FreezableClass):
         self.temperature = temperatures
         self.specific_energy = 4. * sigma * temperatures ** 4. * self.kappa_planck
 
-    def to_hdf5_group(self, group):
+    def to_hdf5_group(self, group, compression=None):
 
         if not self.all_set():
             raise Exception("Not all attributes of the mean opacities are set")
 
         # Create mean opacities table
-        tmean = Table()
-        tmean.add_column(Column(data=self.temperature, name='temperature'))
-        tmean.add_column(Column(data=self.specific_energy, name='specific_energy'))
-        tmean.add_column(Column(data=self.chi_planck, name='chi_planck'))
-        tmean.add_column(Column(data=self.kappa_planck, name='kappa_planck'))
-        tmean.add_column(Column(data=self.chi_inv_planck, name='chi_inv_planck'))
-        tmean.add_column(Column(data=self.kappa_inv_planck, name='kappa_inv_planck'))
-        tmean.add_column(Column(data=self.chi_rosseland, name='chi_rosseland'))
-        tmean.add_column(Column(data=self.kappa_rosseland, name='kappa_rosseland'))
+        tmean = np.empty(len(self.temperature),
+                         dtype=[(a, getattr(self, a).dtype) for a in _ATTRIBUTES])
+        for a in _ATTRIBUTES:
+            tmean[a] = getattr(self, a)
 
         # Add to group
-        tmean.write(group, path='mean_opacities')
+        group.create_dataset('mean_opacities', data=tmean, compression=compression)
 
     def from_hdf5_group(self, group):
 
-        tmean = Table.read(group, path='mean_opacities')
-        self.temperature = tmean['temperature']
-        self.specific_energy = tmean['specific_energy']
-        self.chi_planck = tmean['chi_planck']
-        self.kappa_planck = tmean['kappa_planck']
-        self.chi_inv_planck = tmean['chi_inv_planck']
-        self.kappa_inv_planck = tmean['kappa_inv_planck']
-        self.chi_rosseland = tmean['chi_rosseland']
-        self.kappa_rosseland = tmean['kappa_rosseland']
+        tmean = group['mean_opacities'][()]
+        for a in _ATTRIBUTES:
+            setattr(self, a, tmean[a])
+
+    def to_npz(self, filename):
+
+        if not self.all_set():
+            raise Exception("Not all attributes of the mean opacities are set")
+
+        # The file is written atomically since the cache directory can be
+        # shared between several processes
+        with atomic_open(filename) as f:
+            np.savez(f, **dict((a, getattr(self, a)) for a in _ATTRIBUTES))
+
+    def from_npz(self, filename):
+
+        with np.load(filename) as data:
+            for attribute in _ATTRIBUTES:
+                setattr(self, attribute, data[attribute])
 
     def all_set(self):
         return (self.temperature is not None and
@@ -3,7 +3,6 @@ from __future__ import print_function, division
 import hashlib
 
 import numpy as np
-from astropy.table import Table, Column
 
 from ..util.integrate import integrate_linlog_subset
 from ..util.interpolate import (interp1d_fast, interp1d_fast_loglog,
@@ -67,12 +66,31 @@ class OpticalProperties(FreezableClass):
             self.P3 = self.P3[::-1, :]
             self.P4 = self.P4[::-1, :]
 
-    def initialize_scattering_matrix(self):
+    def initialize_scattering_matrix(self, dtype=float, init=True):
+        """
+        Allocate the scattering matrix elements, and by default initialize
+        them to zero.
 
-        self.P1 = np.zeros((len(self.nu), len(self.mu)))
-        self.P2 = np.zeros((len(self.nu), len(self.mu)))
-        self.P3 = np.zeros((len(self.nu), len(self.mu)))
-        self.P4 = np.zeros((len(self.nu), len(self.mu)))
+        The four elements are views of a single contiguous array with shape
+        ``(4, n_nu, n_mu)``. Setting ``dtype`` to ``np.float32`` halves the
+        memory used by the scattering matrix (and the size of the dust file).
+
+        Parameters
+        ----------
+        dtype : data-type, optional
+            The data type to use for the scattering matrix elements
+        init : bool, optional
+            Whether to set the elements to zero. If `False`, the elements are
+            only allocated, and their values are undefined - this should only
+            be used if all the elements are set afterwards.
+        """
+
+        if init:
+            P = np.zeros((4, len(self.nu), len(self.mu)), dtype=dtype)
+        else:
+            P = np.empty((4, len(self.nu), len(self.mu)), dtype=dtype)
+
+        self.P1, self.P2, self.P3, self.P4 = P
 
     def normalize_scattering_matrix(self):
 
@@ -230,43 +248,44 @@ class OpticalProperties(FreezableClass):
             self.P3 = np.vstack([self.P3, self.P3[-1, :]])
             self.P4 = np.vstack([self.P4, self.P4[-1, :]])
 
-    def to_hdf5_group(self, group):
+    def to_hdf5_group(self, group, compression=None):
 
         if not self.all_set():
             raise Exception("Not all attributes of the optical properties are set")
 
-        # Create optical properties table
-        topt = Table()
-        topt.add_column(Column(data=self.nu, name='nu'))
-        topt.add_column(Column(data=self.albedo, name='albedo'))
-        topt.add_column(Column(data=self.chi, name='chi'))
-
         self.normalize_scattering_matrix()
 
-        topt.add_column(Column(data=self.P1, name='P1'))
-        topt.add_column(Column(data=self.P2, name='P2'))
-        topt.add_column(Column(data=self.P3, name='P3'))
-        topt.add_column(Column(data=self.P4, name='P4'))
-
-        # Sort by frequency
-        topt.sort('nu')
-
-        # Create scattering angles table and add to table set
-        tmu = Table()
-        tmu.add_column(Column(data=self.mu, name='mu'))
+        n_mu = len(self.mu)
+
+        # Create optical properties table, sorted by frequency. The table is
+        # filled directly rather than going through an intermediate astropy
+        # Table, to avoid holding extra copies of the scattering matrix.
+        order = np.argsort(self.nu, kind='mergesort')
+        dtype = [('nu', self.nu.dtype),
+                 ('albedo', self.albedo.dtype),
+                 ('chi', self.chi.dtype)]
+        for name in ('P1', 'P2', 'P3', 'P4'):
+            dtype.append((name, getattr(self, name).dtype, (n_mu,)))
+        topt = np.empty(len(self.nu), dtype=dtype)
+        for name in topt.dtype.names:
+            topt[name] = getattr(self, name)[order]
+
+        # Create scattering angles table
+        tmu = np.empty(n_mu, dtype=[('mu', self.mu.dtype)])
+        tmu['mu'] = self.mu
 
         # Add to group
-        topt.write(group, path='optical_properties')
-        tmu.write(group, path='scattering_angles')
+        group.create_dataset('optical_properties', data=topt, compression=compression)
+        group.create_dataset('scattering_angles', data=tmu, compression=compression)
 
     def from_hdf5_group(self, group):
 
         # Read in the scattering angles
-        tmu = group['scattering_angles']
+        tmu = group['scattering_angles'][()]
         self.mu = tmu['mu']
 
         # Read in the optical properties
-        topt = group['optical_properties']
+        topt = group['optical_properties'][()]
 
         self.nu = topt['nu']
         self.albedo = topt['albedo']
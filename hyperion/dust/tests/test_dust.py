@@ -1,9 +1,13 @@
+import hashlib
+
 import numpy as np
 from numpy.testing import assert_allclose
 import pytest
 
-from .. import SphericalDust, IsotropicDust
+from .. import (dust_type, SphericalDust, IsotropicDust, HenyeyGreensteinDust,
+                HOCHUNKDust, CoatsphSingle, MieXDust, BHDust)
 from ...util.functions import random_id, B_nu
+from ..optical_properties import OpticalProperties
 
 
 def test_missing_properties(tmpdir):
@@ -160,6 +164,128 @@ def test_isotropic_dust():
     albedo = np.repeat(0.5, 100)
     chi = np.ones(100)
     dust = IsotropicDust(nu, albedo, chi)
+    assert_allclose(dust.optical_properties.P1, 1.)
+    assert_allclose(dust.optical_properties.P2, 0.)
+    assert_allclose(dust.optical_properties.P3, 1.)
+    assert_allclose(dust.optical_properties.P4, 0.)
+
+    # The elements should be views of a single packed array
+    P = dust.optical_properties.P1.base
+    assert P.shape == (4, 100, 2)
+    for P_i in (dust.optical_properties.P2, dust.optical_properties.P3,
+                dust.optical_properties.P4):
+        assert P_i.base is P
+
+
+@pytest.fixture(params=['kernel', 'numpy'])
+def hg_backend(request, monkeypatch):
+    """
+    Run a test with both the compiled Numba kernel and the NumPy version of
+    henyey_greenstein.
+    """
+    if request.param == 'kernel':
+        pytest.importorskip('numba')
+        # By default the kernel is only used for large arrays
+        monkeypatch.setattr(dust_type, '_HG_KERNEL_MIN_SIZE', 0)
+    else:
+        monkeypatch.setattr(dust_type, '_hg_kernel', False)
+    return request.param
+
+
+def test_henyey_greenstein_dust(hg_backend):
+
+    nu = np.logspace(0., 20., 50)
+    albedo = np.repeat(0.5, 50)
+    chi = np.ones(50)
+    g = np.linspace(-0.9, 0.9, 50)
+    p_lin_max = np.linspace(0., 0.5, 50)
+
+    dust = HenyeyGreensteinDust(nu, albedo, chi, g, p_lin_max)
+
+    mu = dust.optical_properties.mu
+
+    # Compare to scattering matrix computed one angle at a time
+    for i in range(len(mu)):
+        P1 = (1. - g * g) / (1. + g * g - 2. * g * mu[i]) ** 1.5
+        P2 = - p_lin_max * P1 * (1. - mu[i] * mu[i]) / (1. + mu[i] * mu[i])
+        P3 = P1 * 2. * mu[i] / (1. + mu[i] * mu[i])
+        assert_allclose(dust.optical_properties.P1[:, i], P1)
+        assert_allclose(dust.optical_properties.P2[:, i], P2)
+        assert_allclose(dust.optical_properties.P3[:, i], P3)
+        assert_allclose(dust.optical_properties.P4[:, i], 0.)
+
+
+@pytest.mark.parametrize('g', [0., [0., 0.5, 0.]])
+def test_henyey_greenstein_isotropic(hg_backend, g):
+
+    g = np.atleast_1d(g)
+    mu = np.linspace(-1., 1., 11)
+
+    P1, P2, P3, P4 = dust_type.henyey_greenstein(mu, g, 0.5)
+
+    # For g=0, the phase function should be exactly isotropic
+    for j in np.nonzero(g == 0.)[0]:
+        assert np.all(P1[j] == 1.)
+        assert_allclose(P2[j], - 0.5 * (1. - mu * mu) / (1. + mu * mu))
+        assert_allclose(P3[j], 2. * mu / (1. + mu * mu))
+    assert np.all(P4 == 0.)
+
+
+@pytest.mark.parametrize('n_g', [5, 5000])
+def test_henyey_greenstein_dust_shape_mismatch(hg_backend, n_g):
+
+    # Regression test for a bug that caused the compiled kernel to write out
+    # of bounds (or leave elements unset) if g did not have the same length
+    # as nu
+
+    nu = np.logspace(0., 20., 50)
+    albedo = np.repeat(0.5, 50)
+    chi = np.ones(50)
+    g = np.linspace(-0.9, 0.9, n_g)
+    p_lin_max = np.linspace(0., 0.5, n_g)
+
+    with pytest.raises(ValueError) as exc:
+        HenyeyGreensteinDust(nu, albedo, chi, g, p_lin_max)
+    assert exc.value.args[0] == 'g should be a scalar or have the same length as nu'
+
+    mu = np.linspace(-1., 1., 100)
+    out = tuple(np.empty((50, 100)) for i in range(4))
+
+    with pytest.raises(ValueError) as exc:
+        dust_type.henyey_greenstein(mu, g, p_lin_max, out=out)
+    assert exc.value.args[0] == 'out arrays have shape (50, 100) but expected (%i, 100)' % n_g
+
+    with pytest.raises(ValueError) as exc:
+        dust_type.henyey_greenstein(mu, np.zeros(50), p_lin_max, out=out)
+    assert exc.value.args[0] == 'p_lin_max should be a scalar or have the same shape as g'
+
+
+@pytest.mark.parametrize('g', [0.3, np.linspace(-0.9, 0.9, 50)])
+def test_henyey_greenstein_dust_all_set(monkeypatch, hg_backend, g):
+
+    # The scattering matrix is allocated without being initialized, so check
+    # that all the elements are set by filling the allocated arrays with NaN
+
+    initialize_scattering_matrix = OpticalProperties.initialize_scattering_matrix
+
+    def initialize_with_nans(self, dtype=float, init=True):
+        initialize_scattering_matrix(self, dtype=dtype, init=init)
+        if not init:
+            for P in (self.P1, self.P2, self.P3, self.P4):
+                P.fill(np.nan)
+
+    monkeypatch.setattr(OpticalProperties, 'initialize_scattering_matrix',
+                        initialize_with_nans)
+
+    nu = np.logspace(0., 20., 50)
+    albedo = np.repeat(0.5, 50)
+    chi = np.ones(50)
+
+    dust = HenyeyGreensteinDust(nu, albedo, chi, g, 0.2)
+
+    for P in (dust.optical_properties.P1, dust.optical_properties.P2,
+              dust.optical_properties.P3, dust.optical_properties.P4):
+        assert not np.any(np.isnan(P))
 
 
 def test_sublimation_io(tmpdir):
@@ -182,3 +308,258 @@ def test_sublimation_io(tmpdir):
 
     assert dust2.sublimation_mode == 'fast'
     assert_allclose(dust2.sublimation_energy, 8.3)
+
+
+def test_io_format(tmpdir):
+
+    # The tables should be written as compound datasets that can also be read
+    # with astropy, and should not be compressed by default
+
+    import h5py
+    from astropy.table import Table
+
+    filename = tmpdir.join('test.hdf5').strpath
+
+    nu = np.logspace(8., 16., 50)
+    albedo = np.repeat(0.5, 50)
+    chi = np.ones(50)
+    g = np.linspace(-0.9, 0.9, 50)
+    p_lin_max = np.linspace(0., 0.5, 50)
+    dust = HenyeyGreensteinDust(nu, albedo, chi, g, p_lin_max)
+
+    dust.write(filename)
+
+    with h5py.File(filename, 'r') as f:
+        for path in ['optical_properties', 'scattering_angles', 'mean_opacities',
+                     'emissivities', 'emissivity_variable']:
+            assert f[path].compression is None
+
+    filename_gzip = tmpdir.join('test_gzip.hdf5').strpath
+
+    dust.write(filename_gzip, compression=True)
+
+    with h5py.File(filename_gzip, 'r') as f:
+        for path in ['optical_properties', 'scattering_angles', 'mean_opacities',
+                     'emissivities', 'emissivity_variable']:
+            assert f[path].compression == 'gzip'
+
+    topt = Table.read(filename, path='optical_properties')
+    assert topt.colnames == ['nu', 'albedo', 'chi', 'P1', 'P2', 'P3', 'P4']
+    assert_allclose(topt['nu'], dust.optical_properties.nu)
+    assert_allclose(topt['P2'], dust.optical_properties.P2)
+
+    tmean = Table.read(filename, path='mean_opacities')
+    assert_allclose(tmean['kappa_planck'], dust.mean_opacities.kappa_planck)
+
+    temiss = Table.read(filename, path='emissivities')
+    assert_allclose(temiss['jnu'], dust.emissivities.jnu)
+
+    dust2 = SphericalDust(filename)
+
+    assert_allclose(dust2.mean_opacities.chi_rosseland, dust.mean_opacities.chi_rosseland)
+    assert_allclose(dust2.emissivities.var, dust.emissivities.var)
+    assert_allclose(dust2.emissivities.jnu, dust.emissivities.jnu)
+    assert dust2.emissivities.is_lte
+
+
+def test_hochunk_dust(tmpdir):
+
+    filename = tmpdir.join('hochunk.par').strpath
+
+    wav = np.logspace(-1., 3., 30)
+    np.savetxt(filename, np.vstack([wav, np.repeat(2., 30), np.repeat(1., 30),
+                                    np.repeat(3., 30), np.linspace(0., 0.5, 30),
+                                    np.repeat(0.3, 30)]).T)
+
+    dust = HOCHUNKDust(filename)
+
+    assert_allclose(dust.optical_properties.albedo, 0.5)
+    assert_allclose(dust.optical_properties.chi, 3.)
+
+    with open(filename, 'rb') as f:
+        assert dust.md5 == hashlib.md5(f.read()).hexdigest()
+
+
+def write_miex_files(prefix, wav, albedo, kappa, theta, matrix):
+    np.savetxt(prefix + '.alb', np.vstack([wav, albedo]).T, fmt='%.10e')
+    np.savetxt(prefix + '.k_abs', np.vstack([wav, kappa]).T, fmt='%.10e')
+    for extension, values in zip(['f11', 'f12', 'f33', 'f34'], matrix):
+        with open(prefix + '.' + extension, 'w') as f:
+            f.write("# MieX scattering matrix element\n")
+            for j in range(len(wav)):
+                f.write("{0:.10e}\n".format(wav[j]))
+                for i in range(len(theta)):
+                    f.write("{0:.10e} {1:.10e}\n".format(theta[i], values[j, i]))
+
+
+def test_miex_dust(tmpdir):
+
+    prefix = tmpdir.join('miex').strpath
+
+    np.random.seed(12345)
+
+    wav = np.logspace(3., -1., 20)
+    albedo = np.random.uniform(0.1, 0.9, 20)
+    kappa = np.random.uniform(1., 10., 20)
+    theta = np.linspace(0., 180., 31)
+    matrix = np.random.uniform(0.1, 10., (4, 20, 31))
+
+    write_miex_files(prefix, wav, albedo, kappa, theta, matrix)
+
+    dust = MieXDust(prefix)
+
+    assert_allclose(dust.optical_properties.nu, 2.99792458e14 / wav, rtol=1.e-6)
+    assert_allclose(dust.optical_properties.albedo, albedo)
+    assert_allclose(dust.optical_properties.chi, kappa / (1 - albedo))
+    assert_allclose(dust.optical_properties.mu, np.cos(np.radians(theta[::-1])))
+    assert_allclose(dust.optical_properties.P1, matrix[0][:, ::-1])
+    assert_allclose(dust.optical_properties.P2, matrix[1][:, ::-1])
+    assert_allclose(dust.optical_properties.P3, matrix[2][:, ::-1])
+    assert_allclose(dust.optical_properties.P4, matrix[3][:, ::-1])
+
+
+def test_miex_dust_nan(tmpdir):
+
+    prefix = tmpdir.join('miex').strpath
+
+    np.random.seed(12345)
+
+    wav = np.logspace(3., -1., 20)
+    albedo = np.random.uniform(0.1, 0.9, 20)
+    kappa = np.random.uniform(1., 10., 20)
+    theta = np.linspace(0., 180., 31)
+    matrix = np.random.uniform(0.1, 10., (4, 20, 31))
+
+    # Set NaN values in the same rows for all angles in P1, and in
+    # different places for P2
+    matrix[0, 5, :] = np.nan
+    matrix[1, 7, 3] = np.nan
+    matrix[1, 12, 8] = np.nan
+
+    # A NaN albedo also results in a NaN opacity to extinction
+    albedo[10] = np.nan
+
+    write_miex_files(prefix, wav, albedo, kappa, theta, matrix)
+
+    dust = MieXDust(prefix)
+
+    assert not np.any(np.isnan(dust.optical_properties.albedo))
+    assert not np.any(np.isnan(dust.optical_properties.chi))
+
+    factor = np.log(wav[10] / wav[9]) / np.log(wav[11] / wav[9])
+    assert_allclose(dust.optical_properties.albedo[10],
+                    albedo[9] * (albedo[11] / albedo[9]) ** factor)
+
+    P1 = dust.optical_properties.P1[:, ::-1]
+    P2 = dust.optical_properties.P2[:, ::-1]
+
+    assert not np.any(np.isnan(P1))
+    assert not np.any(np.isnan(P2))
+
+    # The values should be interpolated in log-log space
+    factor = np.log(wav[5] / wav[4]) / np.log(wav[6] / wav[4])
+    assert_allclose(P1[5], matrix[0, 4] * (matrix[0, 6] / matrix[0, 4]) ** factor)
+    factor = np.log(wav[7] / wav[6]) / np.log(wav[8] / wav[6])
+    assert_allclose(P2[7, 3], matrix[1, 6, 3] * (matrix[1, 8, 3] / matrix[1, 6, 3]) ** factor)
+
+
+def write_bhmie_files(prefix):
+
+    np.random.seed(12345)
+
+    wav = np.logspace(3., -1., 20)
+    mu = np.linspace(-1., 1., 31)
+    albedo = np.random.uniform(0.1, 0.9, 20)
+    chi = np.random.uniform(1., 10., 20)
+    matrix = np.random.uniform(0.1, 10., (4, 20, 31))
+
+    np.savetxt(prefix + '.wav', wav)
+    np.savetxt(prefix + '.mu', mu)
+    np.savetxt(prefix + '.alb', albedo)
+    np.savetxt(prefix + '.chi', chi)
+    for extension, values in zip(['f11', 'f12', 'f33', 'f34'], matrix):
+        np.savetxt(prefix + '.' + extension, values)
+
+    return mu, albedo, chi, matrix
+
+
+@pytest.mark.parametrize('cache', [False, True])
+def test_bhmie_dust(tmpdir, cache):
+
+    prefix = tmpdir.join('bhmie').strpath
+
+    mu, albedo, chi, matrix = write_bhmie_files(prefix)
+
+    # Read in twice to make sure that cached files are read correctly
+    for i in range(2):
+        dust = BHDust(prefix, cache=cache)
+        assert_allclose(dust.optical_properties.mu, mu)
+        assert_allclose(dust.optical_properties.albedo, albedo)
+        assert_allclose(dust.optical_properties.chi, chi)
+        assert_allclose(dust.optical_properties.P1, matrix[0])
+        assert_allclose(dust.optical_properties.P4, matrix[3])
+
+    assert tmpdir.join('bhmie.f11.npy').check() is cache
+
+
+def test_bhmie_dust_truncated_cache(tmpdir):
+
+    # A truncated cache file (e.g. from an interrupted run) should be ignored
+    # and replaced
+
+    prefix = tmpdir.join('bhmie').strpath
+
+    mu, albedo, chi, matrix = write_bhmie_files(prefix)
+
+    inputs = set(path.basename for path in tmpdir.listdir())
+
+    BHDust(prefix, cache=True)
+
+    with open(prefix + '.f11.npy', 'rb') as f:
+        content = f.read()
+    with open(prefix + '.f11.npy', 'wb') as f:
+        f.write(content[:len(content) // 2])
+
+    dust = BHDust(prefix, cache=True)
+    assert_allclose(dust.optical_properties.P1, matrix[0])
+
+    assert_allclose(np.load(prefix + '.f11.npy'), matrix[0])
+
+    # No temporary files should be left over
+    expected = inputs | set(name + '.npy' for name in inputs)
+    assert set(path.basename for path in tmpdir.listdir()) <= expected
+
+
+def test_coatsph_single(tmpdir):
+
+    np.random.seed(12345)
+
+    n_wav, n_theta = 5, 19
+
+    wav = np.logspace(2., 0., n_wav)
+    q_ext = np.random.uniform(1., 2., n_wav)
+    q_sca = np.random.uniform(0.1, 1., n_wav)
+    theta = np.linspace(180., 0., n_theta)
+    matrix = np.random.uniform(0.1, 10., (n_wav, 4, n_theta))
+
+    with open(tmpdir.join('coatsph_forw.dat').strpath, 'w') as f:
+        f.write("version\n")
+        f.write("number of dust components is 1\n")
+        f.write("\n" * 3)
+        for j in range(n_wav):
+            f.write("1. 1.e-4 {0:g} {1:g} {2:g} 0. 0.\n".format(wav[j], q_ext[j], q_sca[j]))
+
+    for j in range(n_wav):
+        with open(tmpdir.join('coatsph_scat_{0:04d}_0001.dat'.format(j + 1)).strpath, 'w') as f:
+            f.write("\n" * 9)
+            for i in range(n_theta):
+                f.write("{0:g} {1:g} 0. {2:g} {3:g} {4:g}\n".format(theta[i], *matrix[j, :, i]))
+
+    dust = CoatsphSingle(tmpdir.strpath, 1.e-4, 3.)
+
+    assert_allclose(dust.optical_properties.albedo, q_sca / q_ext, rtol=1.e-5)
+    assert_allclose(dust.optical_properties.mu, np.cos(np.radians(theta)))
+    assert_allclose(dust.optical_properties.P1, matrix[:, 0], rtol=1.e-5)
+    assert_allclose(dust.optical_properties.P2, matrix[:, 1], rtol=1.e-5)
+    assert_allclose(dust.optical_properties.P3, matrix[:, 2], rtol=1.e-5)
+    assert_allclose(dust.optical_properties.P4, matrix[:, 3], rtol=1.e-5)
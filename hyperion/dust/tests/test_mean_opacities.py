@@ -34,6 +34,48 @@ class TestMeanOpacities(object):
         assert_allclose(m.specific_energy,
                         4. * sigma * m.temperature ** 4. * m.kappa_planck)
 
+    def test_compute_cache(self, tmpdir, monkeypatch):
+
+        cache_dir = tmpdir.join('cache').strpath
+
+        m1 = MeanOpacities()
+        m1.compute(self.o, n_temp=10, temp_min=1., temp_max=1000.,
+                   cache_dir=cache_dir)
+
+        assert len(tmpdir.join('cache').listdir()) == 1
+
+        # Make sure the mean opacities are not re-computed
+        monkeypatch.setattr(MeanOpacities, '_compute', None)
+        m2 = MeanOpacities()
+        m2.compute(self.o, n_temp=10, temp_min=1., temp_max=1000.,
+                   cache_dir=cache_dir)
+        monkeypatch.undo()
+
+        assert m1.hash() == m2.hash()
+
+        # Different temperatures should not use the cached values
+        m3 = MeanOpacities()
+        m3.compute(self.o, n_temp=10, temp_min=1., temp_max=100.,
+                   cache_dir=cache_dir)
+
+        assert len(tmpdir.join('cache').listdir()) == 2
+        assert_allclose(m3.temperature[-1], 100.)
+
+    def test_cache_key_version(self, monkeypatch):
+
+        # Cached values should not be re-used by a different version
+        from .. import mean_opacities
+
+        key = MeanOpacities.cache_key(self.o, 10, 1., 1000.)
+        assert MeanOpacities.cache_key(self.o, 10, 1., 1000.) == key
+
+        monkeypatch.setattr(mean_opacities, '_CACHE_VERSION', 2)
+        assert MeanOpacities.cache_key(self.o, 10, 1., 1000.) != key
+        monkeypatch.undo()
+
+        monkeypatch.setattr(mean_opacities, '__version__', '0.0.0')
+        assert MeanOpacities.cache_key(self.o, 10, 1., 1000.) != key
+
     def test_io(self):
 
         m = MeanOpacities()
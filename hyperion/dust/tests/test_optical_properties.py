@@ -224,6 +224,25 @@ def test_set_array_invalid_order2(attribute):
     assert exc.value.args[0] == 'nu needs to be set before ' + attribute
 
 
+@pytest.mark.parametrize(('dtype', 'init'), [(np.float64, True),
+                                              (np.float32, True),
+                                              (np.float64, False)])
+def test_initialize_scattering_matrix(dtype, init):
+    o = OpticalProperties()
+    o.nu = np.logspace(8., 10., 100)
+    o.albedo = np.repeat(0.5, 100)
+    o.chi = np.ones(100)
+    o.mu = [-1., 0., 1.]
+    o.initialize_scattering_matrix(dtype=dtype, init=init)
+    for P in [o.P1, o.P2, o.P3, o.P4]:
+        assert P.dtype == dtype
+        assert P.shape == (100, 3)
+        assert P.flags.c_contiguous
+    if init:
+        o.P1[:, :] = 1.
+        assert np.all(o.P2 == 0.)
+
+
 def test_extrapolate_inner_range():
     o = OpticalProperties()
     o.nu = np.logspace(8., 10., 100)
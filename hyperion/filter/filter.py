@@ -8,6 +8,10 @@ from astropy import units as u
 from ..util.integrate import integrate
 from ..util.validator import validate_scalar, validate_array
 
+# Spectral equivalencies used to convert spectral coordinates to frequencies,
+# defined once since building them is not free
+_SPECTRAL = u.spectral()
+
 
 class Filter(object):
     """
@@ -94,7 +98,9 @@ class Filter(object):
         self.check_all_set()
 
         # Get spectral coordinate in Hz and transmision in fractional terms
-        nu = self.spectral_coord.to(u.Hz, equivalencies=u.spectral()).value
+        # (this is not cached when the attributes are set since the arrays
+        # can be modified in-place)
+        nu = self.spectral_coord.to(u.Hz, equivalencies=_SPECTRAL).value
         tr = self.transmission.to(u.one).value
 
         # Sort in order of increasing Hz
@@ -103,7 +109,7 @@ class Filter(object):
         tr = tr[order]
 
         # Get other parameters for the normalization
-        nu0 = self.central_spectral_coord.to(u.Hz, equivalencies=u.spectral()).value
+        nu0 = self.central_spectral_coord.to(u.Hz, equivalencies=_SPECTRAL).value
         alpha = self.alpha
         beta = self._beta
 
@@ -115,23 +121,31 @@ class Filter(object):
         # Now multiply by nu so that Hyperion returns nu * Fnu
         tr_norm *= nu
 
-        dset = group.create_dataset(name, data=np.array(list(zip(nu, tr, tr_norm)),
-                                                        dtype=[('nu', float),
-                                                               ('tr', float),
-                                                               ('tn', float)]))
+        table = np.empty(nu.shape, dtype=[('nu', float),
+                                          ('tr', float),
+                                          ('tn', float)])
+        table['nu'] = nu
+        table['tr'] = tr
+        table['tn'] = tr_norm
+
+        dset = group.create_dataset(name, data=table)
 
         dset.attrs['name'] = np.string_(self.name)
 
         dset.attrs['alpha'] = self.alpha
         dset.attrs['beta'] = self._beta
-        dset.attrs['nu0'] = self.central_spectral_coord.to(u.Hz, equivalencies=u.spectral()).value
+        dset.attrs['nu0'] = nu0
 
     @classmethod
     def from_hdf5_group(cls, group, name):
 
         self = cls()
-        self.spectral_coord = group[name]['nu'] * u.Hz
-        self.transmission = group[name]['tr'] * u.one
+
+        # Read in the whole table at once rather than one column at a time
+        table = group[name][()]
+
+        self.spectral_coord = table['nu'] * u.Hz
+        self.transmission = table['tr'] * u.one
         self.name = group[name].attrs['name'].decode('utf-8')
 
         self.alpha = group[name].attrs['alpha']
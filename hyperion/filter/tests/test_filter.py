@@ -104,3 +104,43 @@ def test_roundtrip():
                                f2.spectral_coord.to(u.Hz).value)
     np.testing.assert_allclose(f.transmission.to(u.percent).value,
                                f2.transmission.to(u.percent).value)
+
+
+def test_roundtrip_file(tmpdir):
+
+    import h5py
+
+    f = Filter()
+
+    f.name = "2J"
+    f.spectral_coord = [3, 2, 1] * u.micron
+    f.transmission = [4, 5, 6] * u.percent
+    f.central_spectral_coord = 2 * u.micron
+    f.detector_type = 'energy'
+    f.alpha = 1.
+
+    # Modifying the arrays in-place should be taken into account
+    f.transmission[1] = 90 * u.percent
+    f.spectral_coord[0] = 1.5 * u.micron
+
+    filename = tmpdir.join('filter.hdf5').strpath
+
+    with h5py.File(filename, 'w') as h:
+        f.to_hdf5_group(h, "testing")
+
+    with h5py.File(filename, 'r') as h:
+        table = h['testing'][()]
+        assert h['testing'].attrs['beta'] == -1
+        np.testing.assert_allclose(h['testing'].attrs['nu0'],
+                                   (2 * u.micron).to(u.Hz, equivalencies=u.spectral()).value)
+        f2 = Filter.from_hdf5_group(h, "testing")
+
+    # The table is sorted by increasing frequency
+    np.testing.assert_allclose(table['nu'],
+                               ([2, 1.5, 1] * u.micron).to(u.Hz, equivalencies=u.spectral()).value)
+    np.testing.assert_allclose(table['tr'], [0.9, 0.04, 0.06])
+
+    assert f2.name == "2J"
+    assert f2.alpha == 1.
+    assert f2.detector_type == 'energy'
+    np.testing.assert_allclose(f2.transmission.to(u.percent).value, [90, 4, 6])
@@ -6,6 +6,7 @@ import os
 import shutil
 import sys
 import tempfile
+from contextlib import contextmanager
 
 import h5py
 import numpy as np
@@ -243,6 +244,34 @@ def delete_file(file_name):
             sys.exit()
 
 
+@contextmanager
+def atomic_open(filename):
+    """
+    Open a file for writing in binary mode. The content is written to a
+    temporary file in the same directory, which is only moved into place once
+    it has been completely written, so that an interrupted write (or another
+    process writing the same file) cannot leave a truncated file behind.
+    """
+
+    fd, tmp_filename = tempfile.mkstemp(prefix='.' + os.path.basename(filename) + '.',
+                                        suffix='.tmp',
+                                        dir=os.path.dirname(os.path.abspath(filename)))
+
+    # mkstemp creates files that are only readable by the owner, so we set
+    # the permissions that a file created with open() would have
+    umask = os.umask(0)
+    os.umask(umask)
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            os.chmod(tmp_filename, 0o666 & ~umask)
+            yield f
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.remove(tmp_filename)
+        raise
+
+
 def is_numpy_array(variable):
     return issubclass(variable.__class__, (np.ndarray,
                                            np.core.records.recarray,
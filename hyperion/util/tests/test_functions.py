@@ -1,6 +1,7 @@
 import numpy as np
+import pytest
 
-from ..functions import B_nu, dB_nu_dT
+from ..functions import B_nu, dB_nu_dT, atomic_open
 from ..integrate import integrate_loglog
 from ..constants import sigma, k, c
 
@@ -40,3 +41,23 @@ def test_db_nu_dt():
 
         # Check that the two are the same
         np.testing.assert_allclose(db, db_num, rtol=1.e-2)
+
+
+def test_atomic_open(tmpdir):
+
+    filename = tmpdir.join('test.npy').strpath
+
+    with atomic_open(filename) as f:
+        np.save(f, np.arange(10))
+
+    np.testing.assert_array_equal(np.load(filename), np.arange(10))
+
+    # If writing fails, the original file should be left untouched, and the
+    # temporary file should be removed
+    with pytest.raises(ValueError):
+        with atomic_open(filename) as f:
+            f.write(b'truncated')
+            raise ValueError()
+
+    np.testing.assert_array_equal(np.load(filename), np.arange(10))
+    assert [p.basename for p in tmpdir.listdir()] == ['test.npy']